@@ -1,9 +1,12 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import numpy as np
-from io import StringIO
-import traceback # <-- Importer pour un meilleur traceback
+import pyarrow as pa
+import re
+import hashlib
+import os
+import tempfile
+from io import StringIO, BytesIO
 
 # --- Configuration de la Page ---
 st.set_page_config(
@@ -48,25 +51,224 @@ KEYWORDS_SECURITE = {
         'pieds sur le siège', 'mange', 'mendicité', 'sans titre', 'fraude'
     ]
 }
+
+# Catégories spécifiques (les plus importantes en premier)
+CATEGORIES_PRIORITAIRES = [
+    "Agression / Violence",
+    "Harcèlement / Sexisme",
+    "Malaise / Assistance",
+    "Dégradation"
+]
+
+# Motifs construits une seule fois au chargement du module ; sur les chaînes
+# Arrow, str.contains les compile avec RE2 (pyarrow.compute.match_substring_regex)
+PATTERNS_SECURITE = {
+    category: '|'.join(re.escape(kw) for kw in KEYWORDS_SECURITE[category])
+    for category in CATEGORIES_PRIORITAIRES
+}
+# Union de tous les mots-clés prioritaires : un seul passage pour repérer les messages concernés
+PATTERN_SECURITE_GLOBAL = '|'.join(PATTERNS_SECURITE.values())
+
+# Natures (en minuscules) dont les messages sont classés par mots-clés.
+# !! IMPORTANT : J'ai ajouté 'violence' et 'harcèlement' car vos données
+# utilisent ces termes dans la colonne 'Catégorie'
+NATURES_SECURITE = ['sécurité', 'violence physique', 'violence verbale', 'harcèlement sexiste', 'violence sexuelle']
 # -----------------------------------------------------------------
 
+# Lecture CSV par blocs (moteur C) au-delà de ~100 Mo
+CSV_CHUNK_SEUIL_OCTETS = 100 * 1024 * 1024
+CSV_CHUNK_LIGNES = 200_000
+
+# Cache disque des données traitées (Parquet), partagé entre les sessions et les
+# redémarrages. Dossier fixe à côté du script, borné aux fichiers les plus récents.
+PARQUET_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+PARQUET_CACHE_MAX_FICHIERS = 20
+# À incrémenter à chaque changement du nettoyage ou de la classification dans
+# _load_data_cached : les anciens fichiers de cache ne sont alors plus relus.
+PARQUET_CACHE_VERSION = 3
+
 # --- Chargement et Préparation des données ---
-@st.cache_data
+def _compacter_chunk(chunk):
+    """Passe les colonnes texte d'un bloc CSV en chaînes Arrow (buffers contigus)."""
+    for c in chunk.columns:
+        if chunk[c].dtype == object or isinstance(chunk[c].dtype, pd.StringDtype):
+            chunk[c] = chunk[c].astype('string[pyarrow]')
+    return chunk
+
+
+def _concat_chunks(chunks):
+    """
+    Assemble un CSV lu par blocs en compactant chaque bloc dès sa lecture :
+    un seul bloc à la fois est gardé en objets Python.
+    """
+    blocs = [_compacter_chunk(chunk) for chunk in chunks]
+    # Une colonne texte entièrement vide dans un bloc y est lue en float : on
+    # l'aligne sur le texte, sinon pd.concat repasserait la colonne en objets.
+    # Les colonnes numériques vides restent numériques, comme en lecture unique.
+    colonnes_texte = {c for bloc in blocs for c in bloc.columns
+                      if isinstance(bloc[c].dtype, pd.StringDtype)}
+    for bloc in blocs:
+        for c in colonnes_texte:
+            if not isinstance(bloc[c].dtype, pd.StringDtype) and bloc[c].isna().all():
+                bloc[c] = bloc[c].astype('string[pyarrow]')
+    return pd.concat(blocs, ignore_index=True)
+
+
+def _read_csv(buffer, rows_to_skip):
+    """
+    Lit un CSV ';' : moteur pyarrow en priorité, moteur C de pandas en secours.
+    """
+    # Moteur pyarrow : lecture multithread et colonnes Arrow (chaînes UTF-8 contiguës).
+    # Ce moteur ignore skiprows quand l'en-tête est inféré : on passe donc le nombre
+    # de lignes à ignorer via header (devient skip_rows côté pyarrow).
+    try:
+        return pd.read_csv(buffer, delimiter=';', encoding='utf-8-sig', header=rows_to_skip,
+                           engine='pyarrow', dtype_backend='pyarrow')
+    except ValueError:
+        # Fichier mal formé pour pyarrow : on retombe sur le moteur C de pandas
+        buffer.seek(0)
+        if len(buffer.getbuffer()) > CSV_CHUNK_SEUIL_OCTETS:
+            # Gros fichier : lecture par blocs, compactés avant l'assemblage
+            return _concat_chunks(pd.read_csv(buffer, delimiter=';', encoding='utf-8-sig',
+                                              skiprows=rows_to_skip, chunksize=CSV_CHUNK_LIGNES))
+        return pd.read_csv(buffer, delimiter=';', encoding='utf-8-sig', skiprows=rows_to_skip)
+
+
+def _est_texte(dtype):
+    """Chaînes pandas (string[python], string[pyarrow], str) ou Arrow (string, large_string)."""
+    if isinstance(dtype, pd.ArrowDtype):
+        return pa.types.is_string(dtype.pyarrow_dtype) or pa.types.is_large_string(dtype.pyarrow_dtype)
+    return isinstance(dtype, pd.StringDtype)
+
+
+def _types_texte_arrow(df):
+    """
+    Normalise les types que Parquet ne restitue pas à l'identique, pour obtenir
+    les mêmes types après traitement et après relecture du cache : texte et
+    libellés de catégories en string[pyarrow], dates à la seconde en millisecondes.
+    """
+    for c in df.columns:
+        dtype = df[c].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            cats = dtype.categories
+            if cats.dtype == object or _est_texte(cats.dtype):
+                df[c] = df[c].cat.rename_categories(cats.astype('string[pyarrow]'))
+        elif _est_texte(dtype):
+            df[c] = df[c].astype('string[pyarrow]')
+        elif dtype == 'datetime64[s]':
+            # Parquet n'a pas d'unité seconde : les dates y sont stockées en ms
+            df[c] = df[c].astype('datetime64[ms]')
+    return df
+
+
+def _chemin_cache(file_hash, rows_to_skip):
+    """
+    Fichier Parquet d'un téléversement. La signature couvre la version du
+    traitement et les listes de mots-clés : les modifier invalide le cache.
+    """
+    signature = hashlib.blake2b(
+        repr((PARQUET_CACHE_VERSION, KEYWORDS_SECURITE, NATURES_SECURITE)).encode('utf-8'),
+        digest_size=8
+    ).hexdigest()
+    return os.path.join(PARQUET_CACHE_DIR, f"{file_hash}_{rows_to_skip}_{signature}.parquet")
+
+
+def _lire_cache(cache_path):
+    """Relit un fichier de cache Parquet avec les types du traitement initial."""
+    # Catégories, dates et int8 sont relus tels quels ; le texte et les dates à
+    # la seconde sont remis aux types du traitement par _types_texte_arrow
+    return _types_texte_arrow(pd.read_parquet(cache_path, engine='pyarrow'))
+
+
+def _purger_cache():
+    """
+    Ne garde que les PARQUET_CACHE_MAX_FICHIERS fichiers les plus récemment
+    utilisés, temporaires d'écritures interrompues compris.
+    """
+    fichiers = [e for e in os.scandir(PARQUET_CACHE_DIR) if e.name.endswith(('.parquet', '.tmp'))]
+    fichiers.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for e in fichiers[PARQUET_CACHE_MAX_FICHIERS:]:
+        os.remove(e.path)
+
+
+def _parser_heures(heures):
+    """
+    Convertit des heures HH:MM:SS ou HH:MM (formats mélangés acceptés) en
+    datetimes ; les valeurs invalides donnent NaT.
+    """
+    # pyarrow peut déjà typer la colonne en heures : on repasse par le texte
+    heure_str = heures.astype(str)
+    # Format principal déduit de la première heure renseignée : une seule
+    # conversion de la colonne quand le fichier est homogène
+    heures_valides = heures.dropna()
+    premiere_heure = str(heures_valides.iloc[0]).strip() if len(heures_valides) else ''
+    formats = ['%H:%M:%S', '%H:%M'] if premiere_heure.count(':') >= 2 else ['%H:%M', '%H:%M:%S']
+    time_series = pd.to_datetime(heure_str, format=formats[0], errors='coerce')
+    # Seules les valeurs restées NaT sont reconverties avec l'autre format
+    nat = time_series.isna()
+    if nat.any():
+        time_series[nat] = pd.to_datetime(heure_str[nat], format=formats[1], errors='coerce')
+    return time_series
+
+
+def _attach_info(df):
+    """Mémorise le résumé df.info() dans df.attrs : df_raw ne change plus après le chargement."""
+    buffer = StringIO()
+    df.info(buf=buffer)
+    df.attrs['info_str'] = buffer.getvalue()
+    return df
+
+
 def load_data(uploaded_file, rows_to_skip):
+    """
+    Lit le fichier téléversé et délègue le traitement à la fonction en cache,
+    indexée sur l'empreinte du contenu plutôt que sur l'objet UploadedFile.
+    """
+    content = uploaded_file.getvalue()
+    file_hash = hashlib.blake2b(content, digest_size=16).hexdigest()
+    df = _load_data_cached(file_hash, uploaded_file.name, content, rows_to_skip)
+    if df is not None:
+        # Identifiant du jeu de données, réutilisé comme clé de cache des agrégats
+        df.attrs['source_hash'] = f"{file_hash}:{rows_to_skip}"
+    return df
+
+
+# Le préfixe '_' de _content évite à Streamlit de hacher les octets du fichier
+@st.cache_data(show_spinner=False)
+def _load_data_cached(file_hash, file_name, _content, rows_to_skip):
     """
     Charge les données depuis un fichier téléversé et effectue un nettoyage et 
     une ingénierie des caractéristiques (feature engineering) temporelles.
     """
+    cache_path = _chemin_cache(file_hash, rows_to_skip)
+    if os.path.exists(cache_path):
+        try:
+            df = _lire_cache(cache_path)
+            os.utime(cache_path) # Marque le fichier comme récemment utilisé
+            # Rejoue les avertissements émis lors du premier traitement
+            for message in df.attrs.get('avertissements', []):
+                st.warning(message)
+            return _attach_info(df)
+        except Exception:
+            pass # Fichier de cache illisible : on retraite le fichier source
+
+    # Avertissements conservés dans df.attrs (donc dans le Parquet) pour être rejoués
+    avertissements = []
+    def avertir(message):
+        avertissements.append(message)
+        st.warning(message)
+
     try:
+        uploaded_file = BytesIO(_content)
         # MODIFICATION: Lit depuis l'objet fichier téléversé et utilise skiprows
         # --- AJOUT: Vérification du type de fichier ---
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file, delimiter=';', encoding='utf-8-sig', skiprows=rows_to_skip)
-        elif uploaded_file.name.endswith('.xlsx'):
+        if file_name.endswith('.csv'):
+            df = _read_csv(uploaded_file, rows_to_skip)
+        elif file_name.endswith('.xlsx'):
             # Note: L'environnement doit avoir 'openpyxl' d'installé (ex: pip install openpyxl)
             df = pd.read_excel(uploaded_file, skiprows=rows_to_skip)
         else:
-            st.error(f"Type de fichier non supporté : {uploaded_file.name}. Veuillez utiliser .csv ou .xlsx.")
+            st.error(f"Type de fichier non supporté : {file_name}. Veuillez utiliser .csv ou .xlsx.")
             return None
         # --- FIN AJOUT ---
         
@@ -105,9 +307,15 @@ def load_data(uploaded_file, rows_to_skip):
             st.error(f"Erreur: Colonne 'Date' introuvable. Vérifiez 'erreur_log.txt'.")
             return None
         
+        # Colonnes texte en chaînes Arrow : strip/contains passent par les noyaux
+        # pyarrow.compute au lieu d'une boucle Python sur des objets
+        for c in (nature_col, perimetre_col, message_col):
+            if c:
+                df[c] = df[c].astype('string[pyarrow]')
+
         # Colonnes 'Nature'/'Catégorie' et 'Périmètre'
         if not nature_col:
-            st.warning("Colonne 'Nature' ou 'Catégorie' introuvable. Remplissage par 'Non défini'.")
+            avertir("Colonne 'Nature' ou 'Catégorie' introuvable. Remplissage par 'Non défini'.")
             df['Nature_Clean'] = 'Non défini'
         else:
             df['Nature_Clean'] = df[nature_col].str.strip().fillna('Non défini')
@@ -116,7 +324,7 @@ def load_data(uploaded_file, rows_to_skip):
                  df = df.drop(columns=[nature_col])
 
         if not perimetre_col:
-            st.warning("Colonne 'Périmètre' introuvable. Remplissage par 'Non défini'.")
+            avertir("Colonne 'Périmètre' introuvable. Remplissage par 'Non défini'.")
             df['Perimetre_Clean'] = 'Non défini'
         else:
             df['Perimetre_Clean'] = df[perimetre_col].str.strip().fillna('Non défini')
@@ -125,55 +333,65 @@ def load_data(uploaded_file, rows_to_skip):
         
         # --- MODIFICATION : Classification automatique (IA par mots-clés) ---
         if not message_col:
-            st.warning("Colonne 'Message' introuvable. L'analyse de sous-catégorie ne peut pas être effectuée.")
+            avertir("Colonne 'Message' introuvable. L'analyse de sous-catégorie ne peut pas être effectuée.")
             df['Sous_Categorie'] = 'N/A'
         else:
-            # S'assurer que la colonne message est de type string
-            df[message_col] = df[message_col].astype(str)
+            # --- APPLICATION DE VOTRE RÈGLE ---
+            # Si la colonne 'Nature_Clean' n'est pas 'sécurité' (NATURES_SECURITE),
+            # alors la Sous_Categorie devient 'Non concerné'.
+            # Passage par les catégories : la mise en minuscules et isin portent sur
+            # les modalités distinctes, puis on teste les codes entiers ligne à ligne
+            nat_cat = df['Nature_Clean'].astype('category')
+            df['Nature_Clean'] = nat_cat
+            lower_cats = nat_cat.cat.categories.str.lower()
+            codes_securite = np.flatnonzero(lower_cats.isin(NATURES_SECURITE))
+            mask_securite = np.isin(nat_cat.cat.codes.to_numpy(), codes_securite)
             
-            # Créer les conditions pour np.select
-            conditions = []
-            choices = []
+            # Seuls les messages 'sécurité' sont analysés : les autres lignes
+            # valent 'Non concerné' quel que soit leur contenu
+            messages_securite = df[message_col].iloc[np.flatnonzero(mask_securite)]
             
-            # Définir les catégories spécifiques (les plus importantes en premier)
-            specific_categories_order = [
-                "Agression / Violence",
-                "Harcèlement / Sexisme",
-                "Malaise / Assistance",
-                "Dégradation"
-            ]
-
-            for category in specific_categories_order:
-                keywords = KEYWORDS_SECURITE[category]
-                search_pattern = '|'.join(keywords)
-                conditions.append(df[message_col].str.contains(search_pattern, case=False, na=False))
-                choices.append(category)
-
             default_choice = 'Incivilité / Conflit / Autre'
-            df['Sous_Categorie'] = np.select(conditions, choices, default=default_choice)
+            choices = CATEGORIES_PRIORITAIRES + [default_choice]
+            idx = np.full(len(messages_securite), len(CATEGORIES_PRIORITAIRES), dtype=np.int8)
             
-            # --- APPLICATION DE VOTRE RÈGLE ---
-            # Si la colonne 'Nature_Clean' n'est pas 'sécurité',
-            # alors la Sous_Categorie devient 'Non concerné'.
-            # !! IMPORTANT : J'ai ajouté 'violence' et 'harcèlement' car vos données
-            # utilisent ces termes dans la colonne 'Catégorie'
-            natures_securite = ['sécurité', 'violence physique', 'violence verbale', 'harcèlement sexiste', 'violence sexuelle']
-            df['Sous_Categorie'] = df['Sous_Categorie'].where(df['Nature_Clean'].str.lower().isin(natures_securite), 'Non concerné')
+            # Premier passage (RE2, un seul automate) avec l'union des motifs :
+            # les messages sans aucun mot-clé gardent la catégorie par défaut
+            restants = np.flatnonzero(
+                messages_securite.str.contains(PATTERN_SECURITE_GLOBAL, case=False, na=False).to_numpy(dtype=bool)
+            )
+            
+            # Cascade par ordre de priorité : chaque catégorie ne teste que les messages
+            # pas encore classés. Ceux qui restent après l'avant-dernière contiennent
+            # forcément un mot-clé de la dernière catégorie (ils ont passé l'union).
+            for i, category in enumerate(CATEGORIES_PRIORITAIRES[:-1]):
+                if len(restants) == 0:
+                    break
+                trouve = messages_securite.iloc[restants].str.contains(
+                    PATTERNS_SECURITE[category], case=False, na=False
+                ).to_numpy(dtype=bool)
+                idx[restants[trouve]] = i
+                restants = restants[~trouve]
+            idx[restants] = len(CATEGORIES_PRIORITAIRES) - 1
+            
+            sous_categorie = np.full(len(df), 'Non concerné', dtype=object)
+            sous_categorie[mask_securite] = np.asarray(choices, dtype=object)[idx]
+            df['Sous_Categorie'] = sous_categorie
         
         # --- Traitement des dates/heures ---
         df[date_col] = pd.to_datetime(df[date_col], errors='coerce', dayfirst=True) 
 
         if heure_col:
             # Gère les formats HH:MM:SS et HH:MM
-            time_series = pd.to_datetime(df[heure_col], format='%H:%M:%S', errors='coerce').dt.time
-            # Si la conversion échoue (NaT), essayez HH:MM
-            if time_series.isnull().all():
-                 time_series = pd.to_datetime(df[heure_col], format='%H:%M', errors='coerce').dt.time
+            time_series = _parser_heures(df[heure_col])
             
-            df['DateTime'] = pd.to_datetime(df[date_col].astype(str) + ' ' + time_series.astype(str), errors='coerce')
+            # Date + décalage horaire (timedelta) : pas d'aller-retour par des chaînes.
+            # Une date ou une heure manquante donne NaT, comme auparavant.
+            time_offset = time_series - time_series.dt.normalize()
+            df['DateTime'] = df[date_col].dt.normalize() + time_offset
             df['Heure_Jour'] = df['DateTime'].dt.hour
         else:
-            st.warning("La colonne 'Heure' n'a pas été trouvée. Utilisation de la date seule.")
+            avertir("La colonne 'Heure' n'a pas été trouvée. Utilisation de la date seule.")
             df['DateTime'] = df[date_col]
             df['Heure_Jour'] = 0
             
@@ -191,12 +409,46 @@ def load_data(uploaded_file, rows_to_skip):
         # Renomme la colonne nettoyée en 'Nature' pour le reste du script
         df.rename(columns={'Nature_Clean': 'Nature', 'Perimetre_Clean': 'Périmètre'}, inplace=True)
 
-        return df
+        # --- Réduction des types (moins de mémoire, groupby/value_counts plus rapides) ---
+        df['Heure_Jour'] = df['Heure_Jour'].astype('int8')
+        df['Jour_Semaine_Num'] = df['Jour_Semaine_Num'].astype('int8')
+        for c in ('Nature', 'Périmètre', 'Sous_Categorie', 'Jour_Semaine_Nom'):
+            df[c] = df[c].astype('category')
+
+        _types_texte_arrow(df)
+
+        # Tri chronologique : le filtre de dates devient une simple tranche (searchsorted)
+        df = df.sort_values('DateTime', kind='stable', ignore_index=True)
+        df.attrs['avertissements'] = avertissements
+
+        # Le cache disque est facultatif : un échec d'écriture n'empêche pas l'affichage.
+        # Écriture dans un temporaire unique puis renommage atomique : deux sessions
+        # qui traitent le même fichier ne se marchent pas dessus.
+        tmp_path = None
+        try:
+            os.makedirs(PARQUET_CACHE_DIR, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=PARQUET_CACHE_DIR, suffix='.tmp', delete=False) as tmp:
+                tmp_path = tmp.name
+                df.to_parquet(tmp, compression='zstd', engine='pyarrow')
+            os.replace(tmp_path, cache_path)
+            _purger_cache()
+            # On renvoie le fichier relu : mêmes buffers Arrow qu'au prochain chargement
+            # depuis le cache, donc même résumé df.info() (types et mémoire)
+            return _attach_info(_lire_cache(cache_path))
+        except Exception:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+        return _attach_info(df)
     
     except FileNotFoundError:
         st.error(f"Erreur critique : Le fichier '{file_path}' n'a pas été trouvé.")
         return None
     except Exception as e:
+        import traceback # <-- Importé seulement en cas d'erreur, pour un meilleur traceback
         with open("erreur_log.txt", "w", encoding="utf-8") as f:
             f.write("="*50 + "\n")
             f.write("ERREUR INATTENDUE DANS LOAD_DATA (Code Version Corrigée):\n")
@@ -207,6 +459,299 @@ def load_data(uploaded_file, rows_to_skip):
         st.error(f"Erreur lors du chargement ou du traitement du fichier : {e}. Vérifiez 'erreur_log.txt'.")
         return None
 
+# --- Agrégats pour les KPIs et les graphiques ---
+def _modalite_principale(serie):
+    """Valeur la plus fréquente d'une colonne catégorielle (comptage des codes, sans tri)."""
+    codes = serie.cat.codes.to_numpy()
+    return serie.cat.categories[np.bincount(codes[codes >= 0]).argmax()]
+
+
+# Le DataFrame filtré (préfixe '_') n'est pas haché : il est entièrement déterminé
+# par le jeu de données source et la plage de dates, qui forment la clé du cache.
+@st.cache_data(show_spinner=False)
+def compute_aggregates(_df_filtered, source_hash, date_debut, date_fin):
+    """
+    Calcule une fois par plage de dates toutes les données affichées dans les
+    onglets (KPIs, comptages, heatmap, séries temporelles).
+    """
+    df_filtered = _df_filtered
+
+    # Top 10 des natures sur les codes catégoriels : bincount puis tri des seules modalités.
+    # Égalités départagées par ordre des codes, comme value_counts().nlargest(10).
+    nature_cats = df_filtered['Nature'].cat.categories
+    nature_codes = df_filtered['Nature'].cat.codes.to_numpy()
+    counts = np.bincount(nature_codes[nature_codes >= 0], minlength=len(nature_cats))
+    top_codes = np.flatnonzero(counts)
+    top_codes = top_codes[np.lexsort((top_codes, -counts[top_codes]))[:10]]
+    nature_top10 = pd.DataFrame({'Nature': nature_cats[top_codes], 'Nombre': counts[top_codes]})
+
+    # Masque « périmètre défini » calculé une fois, partagé par le camembert et la heatmap
+    defined_mask = (df_filtered['Périmètre'] != 'Non défini').to_numpy()
+    df_defined = df_filtered.iloc[defined_mask]
+
+    perimetre_counts = df_defined['Périmètre'].value_counts().loc[lambda c: c > 0].reset_index()
+    perimetre_counts.columns = ['Périmètre', 'Nombre']
+    perimetre_counts['Périmètre'] = perimetre_counts['Périmètre'].astype(str).str.title()
+
+    df_heatmap_filtered = df_defined.iloc[np.isin(nature_codes[defined_mask], top_codes)]
+    # Matrice Nature x Périmètre remplie directement par les codes (pas de groupby haché)
+    perimetre_cats = df_filtered['Périmètre'].cat.categories
+    H = np.zeros((len(nature_cats), len(perimetre_cats)), dtype=np.int32)
+    np.add.at(H, (df_heatmap_filtered['Nature'].cat.codes.to_numpy(),
+                  df_heatmap_filtered['Périmètre'].cat.codes.to_numpy()), 1)
+    lignes = np.flatnonzero(H.sum(axis=1))
+    colonnes = np.flatnonzero(H.sum(axis=0))
+    # Total croissant de haut en bas, comme l'ordre 'total descending' de l'axe Y
+    lignes = lignes[np.argsort(H[lignes].sum(axis=1), kind='stable')]
+    heatmap = pd.DataFrame(
+        H[np.ix_(lignes, colonnes)],
+        index=pd.Index(nature_cats[lignes], name='Nature'),
+        columns=pd.Index(perimetre_cats[colonnes], name='Périmètre'),
+    )
+
+    df_securite_sub = df_filtered[
+        (df_filtered['Sous_Categorie'] != 'Non concerné') &
+        (df_filtered['Sous_Categorie'] != 'N/A')
+    ]
+    securite_counts = df_securite_sub['Sous_Categorie'].value_counts().loc[lambda c: c > 0].reset_index()
+    securite_counts.columns = ['Sous-Catégorie', 'Nombre']
+
+    daily = df_filtered.groupby('Date_Seule').size().reset_index(name='Nombre')
+    daily['Date_Seule'] = pd.to_datetime(daily['Date_Seule'])
+
+    weekly = df_filtered.groupby(['Jour_Semaine_Num', 'Jour_Semaine_Nom'], observed=True).size().reset_index(name='Nombre').sort_values('Jour_Semaine_Num')
+
+    hourly = df_filtered.groupby('Heure_Jour').size().reset_index(name='Nombre')
+
+    return {
+        'perimetre_principal': _modalite_principale(df_filtered['Périmètre']),
+        'nature_principale': _modalite_principale(df_filtered['Nature']),
+        'nature_top10': nature_top10,
+        'perimetre_counts': perimetre_counts,
+        'heatmap': heatmap,
+        'securite_total': len(df_securite_sub),
+        'securite_counts': securite_counts,
+        'daily': daily,
+        'weekly': weekly,
+        'hourly': hourly,
+    }
+
+# --- Rendu des onglets ---
+# plotly.express n'est importé qu'au premier graphique dessiné (démarrage à froid plus court)
+def _draw_tab1(df_filtered, df_raw):
+    """Onglet 1 : aperçu des données filtrées et informations sur les colonnes."""
+    st.header("Aperçu des Données (selon dates)")
+
+    st.markdown(f"Affichage des **{len(df_filtered)}** signalements (selon les dates sélectionnées).")
+    st.info("La colonne 'Sous_Categorie' est générée automatiquement par le script.")
+
+    # Le dataframe affiche maintenant la nouvelle colonne 'Sous_Categorie'
+    st.dataframe(df_filtered, use_container_width=True)
+
+    st.markdown("### Informations sur les colonnes (Données Brutes)")
+    with st.expander("Cliquez pour voir les détails des colonnes (types et valeurs nulles)"):
+        # Résumé calculé une seule fois au chargement (voir _attach_info)
+        st.text(df_raw.attrs['info_str'])
+
+
+def _draw_tab2(df_filtered, aggregates):
+    """Onglet 2 : analyse par nature, périmètre et sous-catégorie de sécurité."""
+    import plotly.express as px
+
+    st.header("Analyse par Nature et Périmètre")
+
+    if df_filtered.empty:
+        st.warning("Pas de données à afficher pour cette analyse.")
+    else:
+
+        sub_tab1, sub_tab2 = st.tabs(["Vue d'ensemble", "Détail Sécurité"])
+
+        with sub_tab1:
+            st.markdown("### Vue d'ensemble (Périmètre & Nature)")
+            col1, col2 = st.columns(2)
+
+            with col1:
+                st.subheader("Top 10 Natures (Tous Périmètres)")
+                fig_nature = px.bar(
+                    aggregates['nature_top10'],
+                    x='Nombre',
+                    y='Nature',
+                    orientation='h',
+                    title="Top 10 Signalements (Tous Périmètres)",
+                    color_discrete_sequence=[RATP_GREEN]
+                )
+                fig_nature.update_layout(
+                    yaxis={'categoryorder':'total ascending'},
+                    title_font_size=20, # Police réduite pour les graphiques
+                    font_size=12         # Police réduite pour les graphiques
+                )
+                st.plotly_chart(fig_nature, use_container_width=True)
+
+            with col2:
+                st.subheader("Répartition par Périmètre (Global)")
+
+                perimetre_counts = aggregates['perimetre_counts']
+
+                if perimetre_counts.empty:
+                    st.warning("Aucune donnée de périmètre définie à afficher.")
+                else:
+                    fig_perimetre = px.pie(
+                        perimetre_counts,
+                        names='Périmètre',
+                        values='Nombre',
+                        title="Proportion des Signalements par Périmètre",
+                        color_discrete_sequence=px.colors.sequential.Greens_r
+                    )
+                    fig_perimetre.update_traces(textposition='inside', textinfo='percent+label')
+                    fig_perimetre.update_layout(
+                        title_font_size=20, # Police réduite
+                        font_size=12,       # Police réduite
+                        legend_title_text='Périmètre'
+                    )
+                    st.plotly_chart(fig_perimetre, use_container_width=True)
+
+            st.divider()
+
+            # --- AJOUT DE LA HEATMAP ---
+            st.subheader("Croisement Nature / Périmètre (Top 10 Natures)")
+
+            df_heatmap_counts = aggregates['heatmap']
+
+            if df_heatmap_counts.empty:
+                st.warning("Pas de données croisées à afficher (Top 10 Natures vs. Périmètres définis).")
+            else:
+                fig_heatmap = px.imshow(
+                    df_heatmap_counts,
+                    labels={'x': 'Périmètre', 'y': 'Nature', 'color': 'Nombre'},
+                    title="Heatmap des Signalements (Top 10 Natures vs. Périmètres)",
+                    color_continuous_scale='Greens',
+                    text_auto=True, 
+                    aspect='auto',
+                )
+
+                fig_heatmap.update_layout(
+                    xaxis_title="Périmètre",
+                    yaxis_title="Nature",
+                    xaxis_tickangle=-45, 
+                    title_font_size=20, # Police réduite
+                    font_size=12        # Police réduite
+                )
+
+                # Affichage sur une seule colonne pour plus de largeur
+                st.plotly_chart(fig_heatmap, use_container_width=True)
+            # --- FIN DE L'AJOUT ---
+
+
+        with sub_tab2:
+            st.subheader("Détail des Signalements de Sécurité")
+            st.markdown("Cette analyse lit les messages des signalements (uniquement pour la nature 'Sécurité' ou équivalents) et les classe automatiquement.")
+
+            if aggregates['securite_total'] == 0:
+                st.warning("Aucun signalement 'Sécurité' classifié trouvé pour cette période.")
+            else:
+                st.info(f"Total de **{aggregates['securite_total']}** signalements 'Sécurité' classifiés (selon les dates).")
+
+                fig_sub_bar = px.bar(
+                    aggregates['securite_counts'],
+                    x='Nombre',
+                    y='Sous-Catégorie',
+                    orientation='h',
+                    title="Nombre d'incidents par Sous-Catégorie 'Sécurité'",
+                    color_discrete_sequence=[RATP_BLUE]
+                )
+                fig_sub_bar.update_layout(
+                    yaxis={'categoryorder':'total ascending'},
+                    title_font_size=20, # Police réduite
+                    font_size=12        # Police réduite
+                )
+
+                col1_sub, col2_sub = st.columns(2)
+                with col1_sub:
+                    st.plotly_chart(fig_sub_bar, use_container_width=True)
+
+
+def _draw_tab3(df_filtered, aggregates):
+    """Onglet 3 : évolution journalière, hebdomadaire et horaire."""
+    import plotly.express as px
+
+    st.header("Analyse Temporelle des Signalements")
+
+    if df_filtered.empty:
+        st.warning("Pas de données à afficher pour cette analyse.")
+    else:
+        st.subheader("Évolution des Signalements par Jour")
+
+        daily_counts = aggregates['daily']
+
+        fig_line = px.line(
+            daily_counts,
+            x='Date_Seule',
+            y='Nombre',
+            title='Nombre de signalements par jour',
+            markers=True
+        )
+        fig_line.update_traces(line_color=RATP_BLUE)
+        fig_line.update_layout(
+            title_font_size=20, # Police réduite
+            font_size=12        # Police réduite
+        )
+
+        col1_line, col2_line = st.columns(2)
+        with col1_line:
+            st.plotly_chart(fig_line, use_container_width=True)
+
+        st.divider()
+
+        st.subheader("Signalements par Jour de la Semaine")
+
+        weekly_counts = aggregates['weekly']
+
+        if not weekly_counts.empty:
+            fig_weekly = px.bar(
+                weekly_counts,
+                x='Jour_Semaine_Nom',
+                y='Nombre',
+                title="Total des Signalements par Jour de la Semaine",
+                color_discrete_sequence=[RATP_GREEN]
+            )
+            fig_weekly.update_xaxes(categoryorder='array', categoryarray=weekly_counts['Jour_Semaine_Nom'])
+            fig_weekly.update_layout(
+                title_font_size=20, # Police réduite
+                font_size=12        # Police réduite
+            )
+
+            col1_weekly, col2_weekly = st.columns(2)
+            with col1_weekly:
+                st.plotly_chart(fig_weekly, use_container_width=True)
+        else:
+            st.warning("Pas de données pour l'analyse par jour de la semaine.")
+
+        st.divider()
+
+        st.subheader("Signalements par Heure de la Journée")
+
+        hourly_counts = aggregates['hourly']
+
+        if not hourly_counts.empty:
+            fig_hourly = px.bar(
+                hourly_counts,
+                x='Heure_Jour',
+                y='Nombre',
+                title="Total des Signalements par Heure de la Journée",
+                color_discrete_sequence=[RATP_BLUE]
+            )
+            fig_hourly.update_xaxes(type='category', dtick=1)
+            fig_hourly.update_layout(
+                title_font_size=20, # Police réduite
+                font_size=12        # Police réduite
+            )
+
+            col1_hourly, col2_hourly = st.columns(2)
+            with col1_hourly:
+                st.plotly_chart(fig_hourly, use_container_width=True)
+        else:
+            st.warning("Pas de données pour l'analyse par heure (colonne 'Heure' peut-être manquante ou mal formatée).")
+
 # --- Interface Principale ---
 st.title("🚇 Dashboard d'Analyse des Signalements (Périmètre IA)")
 st.info("Veuillez téléverser votre fichier CSV de signalements pour commencer.")
@@ -268,10 +813,18 @@ else:
         date_debut = pd.to_datetime(date_range[0])
         date_fin = pd.to_datetime(date_range[0])
 
-    df_filtered = df_raw[
-        (df_raw['DateTime'] >= date_debut) &
-        (df_raw['DateTime'] <= (date_fin + pd.Timedelta(days=1))) # Inclure la journée de fin
-    ]
+    # df_raw est trié par DateTime (load_data) : deux recherches dichotomiques
+    # donnent une tranche contiguë, sans masque temporaire ni conversion d'unité
+    lo, hi = df_raw['DateTime'].searchsorted([
+        date_debut,
+        date_fin + pd.Timedelta(days=1) # Inclure la journée de fin
+    ])
+    df_filtered = df_raw.iloc[lo:hi]
+
+    # Tous les comptages des onglets, calculés une fois par plage de dates
+    aggregates = None
+    if not df_filtered.empty:
+        aggregates = compute_aggregates(df_filtered, df_raw.attrs['source_hash'], date_debut, date_fin)
 
 
     # --- Métriques Clés (KPIs) ---
@@ -289,12 +842,12 @@ else:
         
         kpi2.metric( 
             label="Périmètre Principal",
-            value=df_filtered['Périmètre'].mode()[0]
+            value=aggregates['perimetre_principal']
         )
         
         kpi3.metric( 
             label="Nature Principale",
-            value=df_filtered['Nature'].mode()[0]
+            value=aggregates['nature_principale']
         )
 
     st.divider()
@@ -308,238 +861,12 @@ else:
 
     # --- Contenu de l'Onglet 1 : Aperçu & Données ---
     with tab1:
-        st.header("Aperçu des Données (selon dates)")
-        
-        st.markdown(f"Affichage des **{len(df_filtered)}** signalements (selon les dates sélectionnées).")
-        st.info("La colonne 'Sous_Categorie' est générée automatiquement par le script.")
-        
-        # Le dataframe affiche maintenant la nouvelle colonne 'Sous_Categorie'
-        st.dataframe(df_filtered, use_container_width=True)
-        
-        st.markdown("### Informations sur les colonnes (Données Brutes)")
-        with st.expander("Cliquez pour voir les détails des colonnes (types et valeurs nulles)"):
-            buffer = StringIO()
-            df_raw.info(buf=buffer)
-            s = buffer.getvalue()
-            st.text(s)
+        _draw_tab1(df_filtered, df_raw)
 
     # --- Contenu de l'Onglet 2 : Analyse Sécurité ---
     with tab2:
-        st.header("Analyse par Nature et Périmètre")
-        
-        if df_filtered.empty:
-            st.warning("Pas de données à afficher pour cette analyse.")
-        else:
-            
-            sub_tab1, sub_tab2 = st.tabs(["Vue d'ensemble", "Détail Sécurité"])
-
-            with sub_tab1:
-                st.markdown("### Vue d'ensemble (Périmètre & Nature)")
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.subheader("Top 10 Natures (Tous Périmètres)")
-                    nature_counts = df_filtered['Nature'].value_counts().nlargest(10).reset_index()
-                    nature_counts.columns = ['Nature', 'Nombre']
-                    
-                    fig_nature = px.bar(
-                        nature_counts,
-                        x='Nombre',
-                        y='Nature',
-                        orientation='h',
-                        title="Top 10 Signalements (Tous Périmètres)",
-                        color_discrete_sequence=[RATP_GREEN]
-                    )
-                    fig_nature.update_layout(
-                        yaxis={'categoryorder':'total ascending'},
-                        title_font_size=20, # Police réduite pour les graphiques
-                        font_size=12         # Police réduite pour les graphiques
-                    )
-                    st.plotly_chart(fig_nature, use_container_width=True)
-    
-                with col2:
-                    st.subheader("Répartition par Périmètre (Global)")
-                    
-                    perimetre_filtered_data = df_filtered[df_filtered['Périmètre'] != 'Non défini']
-                    
-                    if perimetre_filtered_data.empty:
-                        st.warning("Aucune donnée de périmètre définie à afficher.")
-                    else:
-                        perimetre_counts = perimetre_filtered_data['Périmètre'].value_counts().reset_index()
-                        perimetre_counts.columns = ['Périmètre', 'Nombre']
-                        
-                        perimetre_counts['Périmètre'] = perimetre_counts['Périmètre'].str.title()
-                        
-                        fig_perimetre = px.pie(
-                            perimetre_counts,
-                            names='Périmètre',
-                            values='Nombre',
-                            title="Proportion des Signalements par Périmètre",
-                            color_discrete_sequence=px.colors.sequential.Greens_r
-                        )
-                        fig_perimetre.update_traces(textposition='inside', textinfo='percent+label')
-                        fig_perimetre.update_layout(
-                            title_font_size=20, # Police réduite
-                            font_size=12,       # Police réduite
-                            legend_title_text='Périmètre'
-                        )
-                        st.plotly_chart(fig_perimetre, use_container_width=True)
-    
-                st.divider()
-
-                # --- AJOUT DE LA HEATMAP ---
-                st.subheader("Croisement Nature / Périmètre (Top 10 Natures)")
-                
-                top_10_natures = df_filtered['Nature'].value_counts().nlargest(10).index
-                
-                df_heatmap_filtered = df_filtered[
-                    (df_filtered['Périmètre'] != 'Non défini') &
-                    (df_filtered['Nature'].isin(top_10_natures))
-                ]
-                
-                if df_heatmap_filtered.empty:
-                    st.warning("Pas de données croisées à afficher (Top 10 Natures vs. Périmètres définis).")
-                else:
-                    df_heatmap_counts = df_heatmap_filtered.groupby(['Nature', 'Périmètre']).size().reset_index(name='Nombre')
-                    
-                    fig_heatmap = px.density_heatmap(
-                        df_heatmap_counts,
-                        x='Périmètre',
-                        y='Nature',
-                        z='Nombre',
-                        title="Heatmap des Signalements (Top 10 Natures vs. Périmètres)",
-                        color_continuous_scale='Greens',
-                        text_auto=True, 
-                    )
-                    
-                    fig_heatmap.update_layout(
-                        xaxis_title="Périmètre",
-                        yaxis_title="Nature",
-                        xaxis_tickangle=-45, 
-                        yaxis={'categoryorder':'total descending'},
-                        title_font_size=20, # Police réduite
-                        font_size=12        # Police réduite
-                    )
-                    
-                    # Affichage sur une seule colonne pour plus de largeur
-                    st.plotly_chart(fig_heatmap, use_container_width=True)
-                # --- FIN DE L'AJOUT ---
-
-
-            with sub_tab2:
-                st.subheader("Détail des Signalements de Sécurité")
-                st.markdown("Cette analyse lit les messages des signalements (uniquement pour la nature 'Sécurité' ou équivalents) et les classe automatiquement.")
-                
-                df_securite_sub = df_filtered[
-                    (df_filtered['Sous_Categorie'] != 'Non concerné') &
-                    (df_filtered['Sous_Categorie'] != 'N/A')
-                ]
-                
-                if df_securite_sub.empty:
-                    st.warning("Aucun signalement 'Sécurité' classifié trouvé pour cette période.")
-                else:
-                    st.info(f"Total de **{len(df_securite_sub)}** signalements 'Sécurité' classifiés (selon les dates).")
-                    
-                    sub_counts = df_securite_sub['Sous_Categorie'].value_counts().reset_index()
-                    sub_counts.columns = ['Sous-Catégorie', 'Nombre']
-                    
-                    fig_sub_bar = px.bar(
-                        sub_counts,
-                        x='Nombre',
-                        y='Sous-Catégorie',
-                        orientation='h',
-                        title="Nombre d'incidents par Sous-Catégorie 'Sécurité'",
-                        color_discrete_sequence=[RATP_BLUE]
-                    )
-                    fig_sub_bar.update_layout(
-                        yaxis={'categoryorder':'total ascending'},
-                        title_font_size=20, # Police réduite
-                        font_size=12        # Police réduite
-                    )
-                    
-                    col1_sub, col2_sub = st.columns(2)
-                    with col1_sub:
-                        st.plotly_chart(fig_sub_bar, use_container_width=True)
-
+        _draw_tab2(df_filtered, aggregates)
 
     # --- Contenu de l'Onglet 3 : Analyse Temporelle ---
     with tab3:
-        st.header("Analyse Temporelle des Signalements")
-        
-        if df_filtered.empty:
-            st.warning("Pas de données à afficher pour cette analyse.")
-        else:
-            st.subheader("Évolution des Signalements par Jour")
-            
-            daily_counts = df_filtered.groupby('Date_Seule').size().reset_index(name='Nombre')
-            daily_counts['Date_Seule'] = pd.to_datetime(daily_counts['Date_Seule']) 
-
-            fig_line = px.line(
-                daily_counts,
-                x='Date_Seule',
-                y='Nombre',
-                title='Nombre de signalements par jour',
-                markers=True
-            )
-            fig_line.update_traces(line_color=RATP_BLUE)
-            fig_line.update_layout(
-                title_font_size=20, # Police réduite
-                font_size=12        # Police réduite
-            )
-            
-            col1_line, col2_line = st.columns(2)
-            with col1_line:
-                st.plotly_chart(fig_line, use_container_width=True)
-            
-            st.divider()
-
-            st.subheader("Signalements par Jour de la Semaine")
-            
-            weekly_counts = df_filtered.groupby(['Jour_Semaine_Num', 'Jour_Semaine_Nom']).size().reset_index(name='Nombre').sort_values('Jour_Semaine_Num')
-            
-            if not weekly_counts.empty:
-                fig_weekly = px.bar(
-                    weekly_counts,
-                    x='Jour_Semaine_Nom',
-                    y='Nombre',
-                    title="Total des Signalements par Jour de la Semaine",
-                    color_discrete_sequence=[RATP_GREEN]
-                )
-                fig_weekly.update_xaxes(categoryorder='array', categoryarray=weekly_counts['Jour_Semaine_Nom'])
-                fig_weekly.update_layout(
-                    title_font_size=20, # Police réduite
-                    font_size=12        # Police réduite
-                )
-                
-                col1_weekly, col2_weekly = st.columns(2)
-                with col1_weekly:
-                    st.plotly_chart(fig_weekly, use_container_width=True)
-            else:
-                st.warning("Pas de données pour l'analyse par jour de la semaine.")
-
-            st.divider()
-            
-            st.subheader("Signalements par Heure de la Journée")
-            
-            hourly_counts = df_filtered.groupby('Heure_Jour').size().reset_index(name='Nombre')
-            
-            if not hourly_counts.empty:
-                fig_hourly = px.bar(
-                    hourly_counts,
-                    x='Heure_Jour',
-                    y='Nombre',
-                    title="Total des Signalements par Heure de la Journée",
-                    color_discrete_sequence=[RATP_BLUE]
-                )
-                fig_hourly.update_xaxes(type='category', dtick=1)
-                fig_hourly.update_layout(
-                    title_font_size=20, # Police réduite
-                    font_size=12        # Police réduite
-                )
-                
-                col1_hourly, col2_hourly = st.columns(2)
-                with col1_hourly:
-                    st.plotly_chart(fig_hourly, use_container_width=True)
-            else:
-                st.warning("Pas de données pour l'analyse par heure (colonne 'Heure' peut-être manquante ou mal formatée).")
-
+        _draw_tab3(df_filtered, aggregates)
@@ -0,0 +1,26 @@
+"""Configuration commune des tests : accès au module de l'application."""
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Sans les dépendances de l'application, les tests ne sont pas collectés
+if any(importlib.util.find_spec(m) is None for m in ("pandas", "pyarrow", "streamlit")):
+    collect_ignore_glob = ["test_*.py"]
+
+
+@pytest.fixture(scope="session")
+def app():
+    """Module de l'application, importé une seule fois (mode « bare » de Streamlit)."""
+    import essai_app_signalement
+    return essai_app_signalement
+
+
+@pytest.fixture
+def cache_dir(app, tmp_path, monkeypatch):
+    """Dossier de cache Parquet temporaire, propre à chaque test."""
+    monkeypatch.setattr(app, "PARQUET_CACHE_DIR", str(tmp_path))
+    return tmp_path
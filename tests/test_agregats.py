@@ -0,0 +1,29 @@
+"""Vérifie les agrégats calculés pour les onglets."""
+import numpy as np
+import pandas as pd
+
+
+def _df_natures(valeurs):
+    n = len(valeurs)
+    return pd.DataFrame({
+        'Nature': pd.Categorical(valeurs),
+        'Périmètre': pd.Categorical(['Métro'] * n),
+        'Sous_Categorie': pd.Categorical(['Non concerné'] * n),
+        'Date_Seule': [pd.Timestamp('2024-01-01').date()] * n,
+        'Jour_Semaine_Num': np.zeros(n, dtype=np.int8),
+        'Jour_Semaine_Nom': pd.Categorical(['Monday'] * n),
+        'Heure_Jour': np.ones(n, dtype=np.int8),
+    })
+
+
+def test_top10_egalites_comme_nlargest(app):
+    # 8 natures à 3 signalements puis 7 à égalité (2) pour les deux dernières places
+    natures = [f"N{i:02d}" for i in range(15)]
+    valeurs = [n for i, n in enumerate(natures) for _ in range(3 if i < 8 else 2)]
+    df = _df_natures(valeurs)
+    aggregates = app.compute_aggregates.__wrapped__(
+        df, 'test-top10', pd.Timestamp('2024-01-01'), pd.Timestamp('2024-01-02')
+    )
+    attendu = df['Nature'].value_counts().nlargest(10).index.tolist()
+    assert aggregates['nature_top10']['Nature'].tolist() == attendu
+    assert sorted(aggregates['heatmap'].index) == sorted(attendu)
@@ -0,0 +1,74 @@
+"""Vérifie le cache Parquet des fichiers traités."""
+import io
+import os
+
+import pandas as pd
+
+CSV = (
+    "Rapport;;;;;\n;;;;;\n"
+    "Date;Heure;Catégorie;Message;Numéro;Ligne\n"
+    "01/02/2024;10:00:00;Sécurité;agression sur le quai;1;M1\n"
+    "02/02/2024;11:30:00;Propreté;quai sale;2;RER A\n"
+    "03/02/2024;08:15:00;Violence verbale;insultes et harcèlement;3;M4\n"
+).encode("utf-8-sig")
+
+# Dates ISO : lues à la seconde, stockées en millisecondes par Parquet
+CSV_ISO = (
+    "Date;Catégorie;Message;Ligne\n"
+    "2024-02-01;Sécurité;agression sur le quai;M1\n"
+    "2024-02-02;Propreté;quai sale;RER A\n"
+).encode("utf-8-sig")
+
+
+def _info(df):
+    buffer = io.StringIO()
+    df.info(buf=buffer)
+    return buffer.getvalue()
+
+
+def test_relecture_identique(app, cache_dir):
+    charger = app._load_data_cached.__wrapped__
+    df = charger("hash-test", "signalements.csv", CSV, 2)
+    assert len(list(cache_dir.glob("*.parquet"))) == 1
+
+    df_cache = charger("hash-test", "signalements.csv", CSV, 2)
+    pd.testing.assert_frame_equal(df, df_cache)
+    assert _info(df_cache) == _info(df)
+    # Le résumé affiché dans l'onglet 1 est le même avec ou sans cache
+    assert df_cache.attrs["info_str"] == df.attrs["info_str"] == _info(df)
+    # L'avertissement de colonne manquante est conservé pour être rejoué
+    assert df_cache.attrs["avertissements"] == df.attrs["avertissements"]
+    assert any("Périmètre" in m for m in df_cache.attrs["avertissements"])
+
+
+def test_relecture_dates_iso(app, cache_dir):
+    charger = app._load_data_cached.__wrapped__
+    df = charger("hash-iso", "signalements.csv", CSV_ISO, 0)
+    df_cache = charger("hash-iso", "signalements.csv", CSV_ISO, 0)
+    pd.testing.assert_frame_equal(df, df_cache)
+    assert _info(df_cache) == _info(df)
+
+
+def test_echec_ecriture_sans_temporaire(app, cache_dir, monkeypatch):
+    def echec(*args, **kwargs):
+        raise OSError("disque plein")
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", echec)
+    df = app._load_data_cached.__wrapped__("hash-test", "signalements.csv", CSV, 2)
+    assert len(df) == 3
+    assert list(cache_dir.iterdir()) == []
+
+
+def test_signature_suit_les_mots_cles(app, monkeypatch):
+    chemin = app._chemin_cache("hash-test", 2)
+    monkeypatch.setattr(app, "NATURES_SECURITE", app.NATURES_SECURITE + ["vol"])
+    assert app._chemin_cache("hash-test", 2) != chemin
+
+
+def test_purge(app, cache_dir, monkeypatch):
+    monkeypatch.setattr(app, "PARQUET_CACHE_MAX_FICHIERS", 2)
+    for i, nom in enumerate(["0.parquet", "1.tmp", "2.parquet", "3.tmp"]):
+        fichier = cache_dir / nom
+        fichier.write_bytes(b"")
+        os.utime(fichier, (i, i))
+    app._purger_cache()
+    assert sorted(p.name for p in cache_dir.iterdir()) == ["2.parquet", "3.tmp"]
@@ -0,0 +1,56 @@
+"""Vérifie la classification des messages par mots-clés (sous-catégories)."""
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+LIGNES = [
+    ("Sécurité", "Agression suivie de dégradation"),
+    ("Sécurité", "Voyageur ÉVANOUI sur le quai"),
+    ("Sécurité", ""),
+    ("Sécurité", "vitre cassée dans la rame"),
+    ("Sécurité", "personne tombée après un coup"),
+    ("Sécurité", "remarques déplacées puis tag sur la porte"),
+    ("Sécurité", "fume une cigarette"),
+    ("Violence verbale", "INSULTES répétées, harcèlement"),
+    (" SÉCURITÉ ", "Malaise d'un voyageur"),
+    ("Harcèlement sexiste", "gestes déplacés et frottement"),
+    ("Propreté", "agression près du quai"),
+    ("Retard", "malaise voyageur"),
+    ("", "bagarre"),
+]
+
+
+def _csv():
+    lignes = ["Date;Heure;Catégorie;Message;Numéro"]
+    for i, (nature, message) in enumerate(LIGNES):
+        lignes.append(f"{i % 28 + 1:02d}/02/2024;10:00:00;{nature};{message};{i}")
+    return "\n".join(lignes) + "\n"
+
+
+def _classement_reference(app):
+    """Classement d'origine : np.select sur une regex par catégorie, puis règle des natures."""
+    df = pd.read_csv(StringIO(_csv()), delimiter=";")
+    messages = df["Message"].astype(str)
+    ordre = ["Agression / Violence", "Harcèlement / Sexisme", "Malaise / Assistance", "Dégradation"]
+    conditions = [
+        messages.str.contains("|".join(app.KEYWORDS_SECURITE[c]), case=False, na=False) for c in ordre
+    ]
+    sous_categorie = pd.Series(np.select(conditions, ordre, default="Incivilité / Conflit / Autre"))
+    nature = df["Catégorie"].str.strip().fillna("Non défini")
+    natures_securite = ["sécurité", "violence physique", "violence verbale", "harcèlement sexiste", "violence sexuelle"]
+    sous_categorie = sous_categorie.where(nature.str.lower().isin(natures_securite), "Non concerné")
+    return dict(zip(df["Numéro"], sous_categorie))
+
+
+def test_classement_identique_a_np_select(app, cache_dir):
+    df = app._load_data_cached.__wrapped__("hash-classes", "signalements.csv", _csv().encode("utf-8-sig"), 0)
+    assert len(df) == len(LIGNES)
+    obtenu = dict(zip(df["Numéro"], df["Sous_Categorie"].astype(str)))
+    attendu = _classement_reference(app)
+    assert obtenu == attendu
+    # Priorité à la première catégorie trouvée, casse accentuée comprise
+    assert attendu[0] == "Agression / Violence"
+    assert attendu[1] == "Malaise / Assistance"
+    assert attendu[2] == "Incivilité / Conflit / Autre"
+    assert attendu[10] == "Non concerné"
@@ -0,0 +1,76 @@
+"""Vérifie la lecture des CSV exportés (préambule, lecture par blocs, heures)."""
+from io import BytesIO
+
+import pandas as pd
+
+COLONNES = ["Date", "Heure", "Catégorie", "Périmètre", "Message"]
+DONNEES = (
+    "Date;Heure;Catégorie;Périmètre;Message\n"
+    "01/02/2024;10:00:00;Sécurité;Métro;agression sur le quai\n"
+    "02/02/2024;11:30:00;Propreté;RER;quai sale\n"
+)
+
+
+def _csv(preambule, donnees=DONNEES):
+    return BytesIO((preambule + donnees).encode("utf-8-sig"))
+
+
+def test_preambule_meme_nombre_de_champs(app):
+    # Export Excel typique : le préambule a autant de champs que les données
+    df = app._read_csv(_csv("Rapport;;;;\nExport du 01/03/2024;;;;\n;;;;\n"), 3)
+    assert list(df.columns) == COLONNES
+    assert len(df) == 2
+
+
+def test_preambule_moins_de_champs(app):
+    df = app._read_csv(_csv("Rapport\nExport du 01/03/2024\n\n"), 3)
+    assert list(df.columns) == COLONNES
+    assert len(df) == 2
+
+
+def test_sans_preambule(app):
+    df = app._read_csv(_csv(""), 0)
+    assert list(df.columns) == COLONNES
+    assert len(df) == 2
+
+
+def test_lecture_par_blocs(app, monkeypatch):
+    # Ligne incomplète : pyarrow la refuse et le moteur C lit par blocs d'une ligne
+    monkeypatch.setattr(app, "CSV_CHUNK_SEUIL_OCTETS", 0)
+    monkeypatch.setattr(app, "CSV_CHUNK_LIGNES", 1)
+    donnees = (
+        "Date;Numéro;Message\n"
+        "01/02/2024;1;agression sur le quai\n"
+        "02/02/2024;;\n"
+        "03/02/2024;3\n"
+    )
+    df = app._read_csv(_csv("", donnees), 0)
+    assert len(df) == 3
+    # Texte en chaînes Arrow malgré les blocs où la colonne est vide
+    assert df["Message"].dtype.storage == "pyarrow"
+    # Une colonne numérique vide dans un bloc reste numérique
+    assert df["Numéro"].dtype.kind == "f"
+    assert df["Numéro"].tolist()[::2] == [1.0, 3.0]
+
+
+def test_heures_formats_melanges(app):
+    # Première heure en HH:MM, les suivantes en HH:MM:SS
+    heures = pd.Series(["9:05", "10:00:00", "11:30:15", "12:00:00", "13:45:00", "14:00:59", "23:59:59"])
+    resultat = app._parser_heures(heures)
+    assert resultat.notna().all()
+    assert resultat.dt.strftime("%H:%M:%S").tolist()[:2] == ["09:05:00", "10:00:00"]
+
+
+def test_heures_premiere_valeur_invalide(app):
+    resultat = app._parser_heures(pd.Series(["inconnu", "08:15:00", "9:30", None]))
+    assert resultat.isna().tolist() == [True, False, False, True]
+
+
+def test_heures_melangees_toutes_les_lignes_gardees(app, cache_dir):
+    heures = ["9:05", "10:00:00", "11:30:15", "12:00:00", "13:45:00", "14:00:59", "23:59:59"]
+    donnees = "Date;Heure;Catégorie\n" + "".join(
+        f"0{i + 1}/02/2024;{h};Sécurité\n" for i, h in enumerate(heures)
+    )
+    df = app._load_data_cached.__wrapped__("hash-heures", "signalements.csv", donnees.encode("utf-8-sig"), 0)
+    assert len(df) == 7
+    assert sorted(df["Heure_Jour"].tolist()) == [9, 10, 11, 12, 13, 14, 23]